@@ -1,9 +1,40 @@
 # Copyright (c) 2023 Kanta Yasuda (GitHub: @kyasuda516)
 # This software is released under the MIT License, see LICENSE.
 
+import stat as __stat
+import sys as __sys
+import time as __time
 import typing as __typing
 from pathlib import Path as __Path
 
+def _prompt(msg: str) -> str:
+  """プロンプトを表示し、標準入力から1行読み取って返す。
+
+  input()のreadlineフック経由のパスを避け、バッファ付きの
+  sys.stdin.readline()で読む。パイプ入力では特に速い。
+
+  Args:
+    msg (str): ユーザーに表示するプロンプト。
+
+  Returns:
+    str: 末尾の改行を除いた入力行。
+
+  Raises:
+    EOFError: 標準入力が尽きた場合。
+  """
+
+  __sys.stdout.write(msg)
+  __sys.stdout.flush()
+  line = __sys.stdin.readline()
+  if not line:
+    raise EOFError
+  return line.rstrip('\n')
+
+# yes_no_inputで受け付けるトークン。ループのたびにタプルを作らず、
+# frozensetのO(1)参照で判定する。
+_YES = frozenset(('y', 'ye', 'yes'))
+_NO = frozenset(('n', 'no'))
+
 def yes_no_input(message: str) -> bool:
   """ユーザーにはい/いいえの質問を表示し、それに対する回答を返す。
 
@@ -15,10 +46,10 @@ def yes_no_input(message: str) -> bool:
   """
 
   while True:
-    choice = input(f"{message} ([y]/N): ").lower()
-    if choice in ('y', 'ye', 'yes'):
+    choice = _prompt(f"{message} ([y]/N): ").lower()
+    if choice in _YES:
       return True
-    elif choice in ('n', 'no'):
+    elif choice in _NO:
       return False
 
 def num_input(message: str, start: int, stop: int) -> int:
@@ -34,15 +65,14 @@ def num_input(message: str, start: int, stop: int) -> int:
   """
 
   print(message)
-  nums = list(range(start, stop))
   while True:
-    choice = input(f'Prease choose from {start} to {stop-1}: ')
+    choice = _prompt(f'Prease choose from {start} to {stop-1}: ')
     try:
       num = int(choice)
-      if num in nums:
-        return num
-    except:
-      pass
+    except ValueError:
+      continue
+    if start <= num < stop:
+      return num
 
 def num_input2(question: str, options: __typing.Union[list, dict], opt_prefix: str='', opt_suffix: str='') -> __typing.Any:
   """ユーザーに選択肢の入力を促し、リストの値、または辞書のキーに対応する値を返す。
@@ -57,27 +87,31 @@ def num_input2(question: str, options: __typing.Union[list, dict], opt_prefix: s
     Any: 選択された選択肢のキーに対応する値。
   """
 
-  keys = None
-  options_type = type(options).__name__
-
-  if options_type == 'list':
-    keys = list(range(len(options)))
-  elif options_type == 'dict':
+  if isinstance(options, dict):
+    is_dict = True
     keys = list(options.keys())
+  elif isinstance(options, list):
+    is_dict = False
+    keys = range(len(options))
   else:
     raise TypeError("argument 'options' must be list or dict.")
-  
-  msg = question
-  for idx, key in enumerate(keys):
-    msg = f'{msg}\n{idx: 3}\t{opt_prefix}{options[key]}{opt_suffix}'
+
+  # 文字列連結をループで繰り返すと選択肢数の2乗で文字がコピーされるので、
+  # リストに溜めて最後に1回だけjoinする。
+  lines = [question]
+  lines.extend(
+    f'{idx: 3}\t{opt_prefix}{options[key]}{opt_suffix}'
+    for idx, key in enumerate(keys)
+  )
+  msg = '\n'.join(lines)
   idx = num_input(msg, 0, len(keys))
-  
-  if options_type == 'list':
-    value = options[idx]
-    return value
-  elif options_type == 'dict':
+
+  if is_dict:
     key = keys[idx]
     return key
+  else:
+    value = options[idx]
+    return value
 
 
 def blank_ng_input(message: str) -> str:
@@ -94,7 +128,7 @@ def blank_ng_input(message: str) -> str:
   """
 
   while True:
-    choice = input(message).strip()
+    choice = _prompt(message).strip()
     if choice != '':
       return choice
 
@@ -113,14 +147,35 @@ def fpath_existing_input(message: str, ext: str=None) -> __Path:
     TypeError: 入力された値が文字列型ではない場合。
   """
 
+  # 見つからなかったパスを少しの間覚えておき、同じ入力の再試行では
+  # statを呼び直さない。ファイルが後から作られた場合に備えてTTL付き。
+  missing = {}
+  ttl = 2.0
   while True:
-    p = __Path(input(message).strip().replace('"', ''))
-    if (ext is None or p.suffix==ext) and p.exists():
+    s = _prompt(message).strip().replace('"', '')
+    p = __Path(s)
+    if ext is not None and p.suffix != ext:
+      continue
+    now = __time.monotonic()
+    t = missing.get(s)
+    if t is not None and now - t < ttl:
+      continue
+    try:
+      st = p.stat()  # 存在確認と種別判定を1回のstatで
+    except OSError:
+      missing[s] = now
+      continue
+    if __stat.S_ISREG(st.st_mode):
       return p
 
 class Outputter():
   """テキストファイルに文字列を出力するためのクラス。
 
+  ファイルは最初のoutput()のときに一度だけ開き、以後は
+  同じハンドルを使い回す。毎回開閉するよりシステムコールが減り、
+  細かい書き込みもバッファでまとめられる。一度も出力しなければ
+  ディスクには触れない。
+
   Args:
     txt_path (pathlib.Path): 出力先テキストファイルのパス。
 
@@ -128,19 +183,30 @@ class Outputter():
     txt_path (pathlib.Path): 出力先テキストファイルのパス。
   """
 
+  import typing as __typing
   from pathlib import Path as __Path
-  def __init__(self, txt_path: __Path, encoding: str='UTF-8'):
-    """Outputterクラスのコンストラクタ。引数で指定されたパスのテキストファイルを作成する。
+  from contextlib import contextmanager as __contextmanager
+  def __init__(self, txt_path: __Path, encoding: str='UTF-8', buffering: int=-1):
+    """Outputterクラスのコンストラクタ。この時点ではファイルは作成されない。
 
     Args:
       txt_path (pathlib.Path): 出力先テキストファイルのパス。
+      encoding (str, optional): ファイルのエンコーディング。デフォルトは'UTF-8'。
+      buffering (int, optional): open()に渡すバッファリング設定。デフォルトは-1（既定のバッファ）。
     """
 
     self.txt_path = txt_path
     self.encoding = encoding
-    with open(self.txt_path.as_posix(), 'w', encoding=self.encoding) as f:
-      f.write('')
-  
+    self._buffering = buffering
+    self._f = None
+
+  def _ensure_open(self):
+    """最初の出力時にファイルを開く（作成・切り詰め）。"""
+
+    if self._f is None:
+      self._f = open(self.txt_path, 'w', encoding=self.encoding, buffering=self._buffering)
+    return self._f
+
   def output(self, msg: str):
     """テキストファイルに文字列を追記する。
 
@@ -151,5 +217,72 @@ class Outputter():
       None
     """
 
-    with open(self.txt_path.as_posix(), 'a', encoding=self.encoding) as f:
-      f.write(msg)
+    self._ensure_open().write(msg)
+
+  def output_many(self, msgs: __typing.Iterable[str]):
+    """複数の文字列をまとめてテキストファイルに追記する。
+
+    1件ずつoutput()を呼ぶよりPythonレベルの呼び出し回数が減る。
+
+    Args:
+      msgs (Iterable[str]): 出力する文字列のイテラブル。
+
+    Returns:
+      None
+    """
+
+    self._ensure_open().writelines(msgs)
+
+  def output_join(self, parts: __typing.Iterable[str], sep: str=''):
+    """文字列群をsepで連結し、一度の書き込みで追記する。
+
+    Args:
+      parts (Iterable[str]): 連結する文字列のイテラブル。
+      sep (str, optional): 区切り文字。デフォルトは空文字列。
+
+    Returns:
+      None
+    """
+
+    self._ensure_open().write(sep.join(parts))
+
+  @__contextmanager
+  def batch(self):
+    """flush()をブロックの終わりまで遅延させるコンテキストマネージャ。
+
+    ※with文で使うこと。大量の細かい書き込みをバッファにまとめたいときに。
+    """
+
+    try:
+      yield self
+    finally:
+      if self._f is not None:
+        self._f.flush()
+
+  def reset(self):
+    """出力先ファイルを空にする。まだ開いていなければ開く（作成・切り詰め）。"""
+
+    if self._f is None:
+      self._ensure_open()
+    else:
+      self._f.seek(0)
+      self._f.truncate()
+
+  def close(self):
+    """ファイルを閉じる。以後の出力はできない。"""
+
+    if self._f is not None:
+      self._f.close()
+
+  def __enter__(self):
+    return self
+
+  def __exit__(self, exc_type, exc_value, traceback):
+    self.close()
+
+  def __del__(self):
+    try:
+      if self._f is not None:
+        self._f.close()
+    except Exception:
+      pass
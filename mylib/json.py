@@ -6,12 +6,12 @@ import typing as __typing
 from pathlib import Path as __Path
 
 def load(path: __Path) -> __typing.Any:
-  with open(path.as_posix(), 'r') as f:
+  with open(path, 'r') as f:
     d = __json.load(f)
   return d
 
 def dump(data: __typing.Any, path: __Path):
-  with open(path.as_posix(), 'w') as f:
+  with open(path, 'w') as f:
     __json.dump(data, f, indent=2)
 
 
@@ -1,23 +1,45 @@
 # Copyright (c) 2023 Kanta Yasuda (GitHub: @kyasuda516)
 # This software is released under the MIT License, see LICENSE.
 
+import re as __re
+import tempfile as __tempfile
+from functools import lru_cache as __lru_cache
 from pathlib import Path as __Path
+from pathlib import PosixPath as __PosixPath
+from pathlib import WindowsPath as __WindowsPath
+from typing import Iterable as __Iterable
+from typing import List as __List
 from typing import Union as __Union
+import os
 import shutil
 
+# fix_path用のコンパイル済みパターン。呼び出しごとの再コンパイルを避けるため
+# モジュール読み込み時に1回だけ作る。
+_RE_DRIVE = __re.compile(r'[a-zA-Z]\:\\')
+_RE_RESERVED_FULL = __re.compile(r'(aux|con|nul|prn|com\d|lpt\d)(\..+)?', __re.IGNORECASE)
+_RE_RESERVED_SUB = __re.compile(r'^(aux|con|nul|prn|com\d|lpt\d)', __re.IGNORECASE)
+
+@__lru_cache(maxsize=None)
+def _win_invalid_trans(new_char: str) -> dict:
+  """Windowsで不正な文字をnew_charへ写す変換テーブルを返す。
+
+  str.translate()用。new_charごとに1回だけ作ればよいのでキャッシュする。
+  """
+
+  return str.maketrans({c: new_char for c in ':*?"<>|\n\r\t\v'})
+
 def create_temp_path(ext: str) -> __Path:
   """拡張子つきで一時ファイルのパスを作成して返す。
-  
+
   ext: ピリオドつきの拡張子
   """
 
-  from tempfile import TemporaryFile
-  while True:
-    f = TemporaryFile()
-    stem = f.name
-    f.close()
-    p = __Path(f'{stem}{ext}')
-    if not p.exists(): return p
+  # mkstempは一意な名前をアトミックに確保してくれるので、
+  # 存在確認のループは不要。
+  fd, name = __tempfile.mkstemp(suffix=ext)
+  os.close(fd)
+  os.unlink(name)
+  return __Path(name)
 
 def mkdir_empty(path: __Union[__Path, str], exist_ok: bool=False):
   """空のディレクトリを作成
@@ -36,13 +58,51 @@ def mkdir_empty(path: __Union[__Path, str], exist_ok: bool=False):
       )
   if path.is_dir():
     import shutil
-    shutil.rmtree(path.as_posix())
+    shutil.rmtree(path)
   else:
     path.unlink()
   path.mkdir(parents=True)
 
+@__lru_cache(maxsize=4096)
+def _fix_component(
+    comp: str,
+    is_first: bool,
+    is_posix: bool,
+    is_win: bool,
+    pre_period: bool,
+    new_char: str
+    ) -> str:
+  """パスの構成要素1つを修正して返す。
+
+  構成要素の修正は純粋な文字列変換なので、lru_cacheでメモ化する。
+  プロジェクトルートや日付フォルダなど同じ要素が繰り返し現れる場合、
+  2回目以降は正規表現を使わずに辞書参照だけで済む。
+  """
+
+  # 先頭のピリオドが許可されていない場合、置換
+  if not pre_period and comp and comp[0]=='.' and comp not in ('.', '..'):
+    comp = new_char + comp[1:]
+
+  # Unixマシンの場合
+  if is_posix:
+    comp = comp.replace(':', new_char)
+
+  # Windowsの場合
+  if is_win:
+    # 不正な文字を置換（固定文字の置換なので正規表現ではなくtranslateで1パス）
+    if not (is_first and _RE_DRIVE.fullmatch(comp)):
+      comp = comp.translate(_win_invalid_trans(new_char))
+    # 末尾のピリオドを置換
+    if comp and comp[-1]=='.' and comp not in ('.', '..'):
+      comp = comp[:-1] + new_char
+    # 予約語はステム末尾に文字を付加する
+    if _RE_RESERVED_FULL.fullmatch(comp):
+      comp = _RE_RESERVED_SUB.sub(f'\\1{new_char}', comp)
+
+  return comp
+
 def fix_path(
-    path: __Union[__Path, str], 
+    path: __Union[__Path, str],
     pre_period: bool=True,
     new_char: str='_'
     ) -> __Path:
@@ -58,59 +118,45 @@ def fix_path(
 
   path = __Path(path) if isinstance(path, str) else path
 
-  from pathlib import PosixPath, WindowsPath
-  comps = list(path.parts)
-  
-  # 先頭のピリオドが許可されていない場合、置換
-  if not pre_period:
-    comps = [
-      new_char + comp[1:]
-      for comp in comps
-      if comp[0]=='.' and not comp in ('.', '..')
-    ]
+  is_posix = isinstance(path, __PosixPath)
+  is_win = isinstance(path, __WindowsPath)
+  return __Path(*[
+    _fix_component(comp, i==0, is_posix, is_win, pre_period, new_char)
+    for i, comp in enumerate(path.parts)
+  ])
 
-  # Unixマシンの場合
-  if isinstance(path, PosixPath):
-    comps = [
-      comp.replace(':', new_char)
-      for comp in comps
-    ]
+def fix_paths(
+    paths: __Iterable[__Union[__Path, str]],
+    pre_period: bool=True,
+    new_char: str='_'
+    ) -> __List[__Path]:
+  """複数のパスをまとめてfix_pathと同様に修正し、リストで返す。
 
-  # Windowsの場合
-  if isinstance(path, WindowsPath):
-    import re
-    # 不正な文字を置換
-    comps = [
-      re.sub(r'[\:\*\?"\<\>\|\n\r\t\v]', new_char, comp)
-      if not (i==0 and re.compile(r'[a-zA-Z]\:\\').fullmatch(comp))
-      else comp
-      for i, comp in enumerate(comps)
-    ]
-    # 末尾のピリオドを置換
-    comps = [
-      comp[:-1] + new_char
-      if comp[-1]=='.' and not comp in ('.', '..')
-      else comp
-      for comp in comps
-    ]
-    # 予約語はステム末尾に文字を付加する
-    comps = [
-      re.sub(
-        r'^(aux|con|nul|prn|com\d|lpt\d)',
-        f'\\1{new_char}',
-        comp,
-        flags=re.IGNORECASE
-      )
-      if re.fullmatch(
-        r'(aux|con|nul|prn|com\d|lpt\d)(\..+)?', 
-        comp, 
-        flags=re.IGNORECASE
-      )
-      else comp
-      for comp in comps
-    ]
-  
-  return __Path(*comps)
+  構成要素をパス横断で重複排除し、同じ要素は1回だけ変換する。
+  プロジェクトルートなど共通の親ディレクトリをもつパス群では、
+  1件ずつfix_pathを呼ぶより変換回数が大幅に減る。
+
+  - paths: ファイルまたはディレクトリのパスのイテラブル
+  - pre_period: 先頭の `.` を許可するかどうか。False にすると先頭の `.` は置換される。
+  - new_char: 不当な文字を用いていた場合、それを何に置換するか。
+  """
+
+  paths = [__Path(p) if isinstance(p, str) else p for p in paths]
+  mapping = {}
+  fixed = []
+  for path in paths:
+    is_posix = isinstance(path, __PosixPath)
+    is_win = isinstance(path, __WindowsPath)
+    comps = []
+    for i, comp in enumerate(path.parts):
+      key = (comp, i==0, is_posix, is_win)
+      fixed_comp = mapping.get(key)
+      if fixed_comp is None:
+        fixed_comp = _fix_component(comp, i==0, is_posix, is_win, pre_period, new_char)
+        mapping[key] = fixed_comp
+      comps.append(fixed_comp)
+    fixed.append(__Path(*comps))
+  return fixed
 
 def avoid_overwrite(path: __Union[__Path, str], is_dir=False) -> __Path:
   """ファイルやディレクトリが既に存在する場合に、数字を付け加えることで上書きを回避
@@ -122,13 +168,15 @@ def avoid_overwrite(path: __Union[__Path, str], is_dir=False) -> __Path:
   path = __Path(path) if isinstance(path, str) else path
 
   if not path.exists(): return path
+  # 1回のscandirで親ディレクトリの名前一覧を取り、存在確認を集合の参照で済ませる。
+  # 候補ごとにstatするより速い。
+  with os.scandir(path.parent) as it:
+    existing = {entry.name for entry in it}
+  stem, suffix = (path.name, '') if is_dir else (path.stem, path.suffix)
   n = 1
-  while True:
-    new_path = path.with_name(f'{path.name} ({n})') \
-      if is_dir \
-      else path.with_stem(f'{path.stem} ({n})')
-    if not new_path.exists(): return new_path
+  while f'{stem} ({n}){suffix}' in existing:
     n += 1
+  return path.with_name(f'{stem} ({n}){suffix}')
 
 def move(src_path: __Union[__Path, str], dst_path: __Union[__Path, str]) -> None:
   shutil.move(src_path, dst_path)
@@ -152,28 +200,66 @@ class TempDirPath(type(__Path())):  # これそのままPathを継承しよう
 
   def __new__(cls, **kwargs: __Any):
     temp_path = create_temp_path('')
-    self = super().__new__(cls, temp_path.as_posix(), **kwargs)
+    self = super().__new__(cls, temp_path, **kwargs)
     temp_path.mkdir()
+    # 中身が残っている可能性があるかどうか。外部からファイルが作られうるので
+    # 最初はTrueにしておき、空にしたことが確実な操作の末尾でFalseへ落とす。
+    self._dirty = True
     return self
 
   def move_contents(self, dir_path: __Union[__Path, str]):
     """中身をまるごと別のディレクトリへと移動
-    
+
     なお、別ディレクトリに同名のファイルがあれば上書きされる。
     dir_path: 移動先のディレクトリのパス
     """
 
-    dir_path = __Path(dir_path) if isinstance(dir_path, str) else dir_path
-    
-    for p in self.iterdir():
-      shutil.move(p.as_posix(), (dir_path / p.name).as_posix())
+    dst = str(dir_path)
+
+    # 移動先が存在しなければディレクトリごとrename（1システムコール）で済ませ、
+    # 一時フォルダを作り直す。
+    if not os.path.exists(dst):
+      try:
+        os.rename(self, dst)
+        self.mkdir()
+        self._dirty = False
+        return
+      except OSError:
+        pass  # 別ファイルシステムへの移動などは1件ずつにフォールバック
+
+    # iterdir()は要素ごとにPathを作るが、scandirのDirEntryは.path/.name を
+    # 文字列で持っているのでアロケーションが要らない。
+    with os.scandir(self) as it:
+      for entry in it:
+        try:
+          os.replace(entry.path, os.path.join(dst, entry.name))
+        except OSError:
+          shutil.move(entry.path, os.path.join(dst, entry.name))
+    self._dirty = False
 
   def empty(self):
-    """フォルダを空にする"""
+    """フォルダを空にする
+
+    フォルダ自体は削除・再作成せず、中身だけを消す。
+    rmtree+mkdirのようにディレクトリ自体を作り直すコストがかからない。
+    """
 
-    shutil.rmtree(self.as_posix())
-    self.mkdir()
+    with os.scandir(self) as it:
+      for entry in it:
+        if entry.is_dir(follow_symlinks=False):
+          shutil.rmtree(entry.path)
+        else:
+          os.unlink(entry.path)
+    self._dirty = False
 
   def __del__(self):
-    shutil.rmtree(self.as_posix(), ignore_errors=True)  # 削除に失敗してもエラーにしない
+    # 空のままなら再帰的な走査は不要で、rmdir1回で済む。
+    # （_dirtyが無い・空でない等の場合はrmtreeにフォールバック）
+    if not getattr(self, '_dirty', True):
+      try:
+        os.rmdir(self)
+        return
+      except OSError:
+        pass
+    shutil.rmtree(self, ignore_errors=True)  # 削除に失敗してもエラーにしない
 